@@ -3,22 +3,199 @@
 """
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import importlib
 from pathlib import Path
+import time
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
 import click
-from tools.recipe_filterer import filter_recipes
 
-from tools.recipe_preprocessor import preprocess_recipes
+# Keep top-level imports light: step modules pull in pandas/pydantic and are only imported when a step runs
+from tools.util import (
+    CONFIG_PATH,
+    HANDLERS_FILENAME,
+    OREDICT_FILENAME,
+    RECIPES_FILTERED_FILENAME,
+    RECIPES_INPUT_FILENAME,
+    RECIPES_PREPROCESSED_FILENAME,
+    get_hash,
+    get_load_counts,
+    get_loaded_by_hash,
+    read_cached_sha,
+    seed_loaded_by_hash,
+)
+
+if TYPE_CHECKING:
+    from tools.diff_format import DiffEntry
+    from tools.nerd_format import Stack
+
+
+class Step(NamedTuple):
+    target: str  # "module:function", imported on first use
+    input_filename: str  # File whose hash the step uses as its cache key
+    output_filename: str
+    options: tuple[str, ...] = ()  # CLI options forwarded to the step as keyword arguments
+    # "module:function" computing the cache key (or None if inputs are missing) from the data dir and options
+    cache_key: Optional[str] = None
+
 
 steps_dict = OrderedDict(
     [
-        ("preprocess", preprocess_recipes),
-        ("filter", filter_recipes),
+        (
+            "preprocess",
+            Step(
+                "tools.recipe_preprocessor:preprocess_recipes",
+                RECIPES_INPUT_FILENAME,
+                RECIPES_PREPROCESSED_FILENAME,
+                options=("pushdown", "pipeline"),
+                cache_key="tools.cache_keys:get_preprocess_cache_key",
+            ),
+        ),
+        (
+            "filter",
+            Step(
+                "tools.recipe_filterer:filter_recipes",
+                RECIPES_PREPROCESSED_FILENAME,
+                RECIPES_FILTERED_FILENAME,
+                cache_key="tools.cache_keys:get_filter_cache_key",
+            ),
+        ),
     ]
 )
 
 
-@click.command()
-@click.option("--data_dir", "-d", type=click.Path(exists=True), default="data")
+def resolve(target: str) -> Callable:
+    module_name, function_name = target.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def load_step(name: str) -> Callable[..., bool]:
+    return resolve(steps_dict[name].target)
+
+
+def get_step_options(step: Step, options: dict[str, Any]) -> dict[str, Any]:
+    return {k: options[k] for k in step.options}
+
+
+def step_status(data_path: Path, step: Step, options: dict[str, Any]) -> str:
+    input_file = data_path / step.input_filename
+    output_file = data_path / step.output_filename
+    if not input_file.exists():
+        return "missing input"
+    cached_sha = read_cached_sha(output_file)
+    if cached_sha is None:
+        return "not built"
+    if step.cache_key:
+        sha = resolve(step.cache_key)(data_path, **get_step_options(step, options))
+        if sha is None:
+            return "missing input"
+    else:
+        sha = get_hash(input_file)
+    if cached_sha != sha:
+        return "out of date"
+    return "up to date"
+
+
+def run_steps(
+    data_path: Path, output_path: Path, steps: list[str], options: dict[str, Any]
+) -> bool:
+    # We can create output directory if it doesn't exist
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    for i, s in enumerate(steps):
+        print()
+        print(f"Running step {i+1}/{len(steps)}: {s}")
+        if s not in steps_dict:
+            click.echo(f"Step '{s}' not found")
+            return False
+        # Check the cache before importing the step, so fully cached runs never load pandas/pydantic
+        if step_status(data_path, steps_dict[s], options) == "up to date":
+            print("Cached output is up to date, skipping")
+            continue
+        step_options = get_step_options(steps_dict[s], options)
+        if not load_step(s)(data_path, output_path, **step_options):
+            click.echo(f"Step '{s}' failed")
+            return False
+    return True
+
+
+class DumpResult(NamedTuple):
+    data_dir: Path
+    success: bool
+    seconds: float
+    outputs: list[Path]
+    indices_reused: int  # Loads served from the shared index cache
+    indices_loaded: int  # Loads that had to read and parse files
+    error: Optional[str] = None
+
+
+def run_dump(
+    data_path: Path, output_path: Path, steps: list[str], options: dict[str, Any]
+) -> DumpResult:
+    start = time.perf_counter()
+    counts_before = get_load_counts()
+    try:
+        success = run_steps(data_path, output_path, steps, options)
+        error = None
+    except Exception as e:
+        success, error = False, f"{type(e).__name__}: {e}"
+    outputs = [
+        data_path / steps_dict[s].output_filename
+        for s in steps
+        if (data_path / steps_dict[s].output_filename).exists()
+    ]
+    counts = get_load_counts()
+    return DumpResult(
+        data_path,
+        success,
+        time.perf_counter() - start,
+        outputs,
+        counts["reused"] - counts_before["reused"],
+        counts["loaded"] - counts_before["loaded"],
+        error,
+    )
+
+
+def get_index_set(data_path: Path) -> tuple[str, ...]:
+    """
+    Identifies the config, handlers and oredict a dump would load, by content. Dumps with the same index set share indices.
+    """
+    files = [Path(CONFIG_PATH), data_path / HANDLERS_FILENAME, data_path / OREDICT_FILENAME]
+    return tuple(get_hash(f) if f.exists() else "" for f in files)
+
+
+def format_stacks(stacks: list["Stack"]) -> str:
+    return ", ".join(f"{s.amount}x {s.type}:{s.slug}" for s in stacks)
+
+
+def format_diff_entry(entry: "DiffEntry") -> str:
+    inputs = ", ".join(f"{s.type}:{s.slug}" for s in entry.inputs)
+    outputs = ", ".join(f"{s.type}:{s.slug}" for s in entry.outputs)
+    lines = [f"{entry.machine}: {inputs} -> {outputs}"]
+    for label, variants in (("old", entry.old), ("new", entry.new)):
+        for v in variants:
+            meta = f" ({v.meta.EUt} EU/t, {v.meta.ticks} ticks)" if v.meta else ""
+            lines.append(
+                f"    {label}: {format_stacks(v.inputs)} -> {format_stacks(v.outputs)}{meta}"
+            )
+    return "\n".join(lines)
+
+
+def read_manifest(manifest: Path) -> list[Path]:
+    """
+    Reads a batch manifest: one data directory per line, relative to the manifest. Blank lines and # comments are ignored.
+    """
+    data_dirs = []
+    for line in manifest.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            data_dirs.append(manifest.parent / line)
+    return data_dirs
+
+
+@click.group(invoke_without_command=True)
+# Not checked for existence here: only running steps and status use it
+@click.option("--data_dir", "-d", type=click.Path(file_okay=False), default="data")
 @click.option("--output_dir", "-o", type=click.Path(), default="output")
 @click.option(
     "--steps",
@@ -27,8 +204,38 @@ steps_dict = OrderedDict(
     multiple=True,
     default=["all"],
 )
-def cli(data_dir: str, output_dir: str, steps: list[str]):
+@click.option(
+    "--pushdown",
+    is_flag=True,
+    help="Skip handlers the filter step would discard while preprocessing",
+)
+@click.option(
+    "--pipeline",
+    is_flag=True,
+    help="Read and parse the dump on background threads while preprocessing, and report per-stage throughput",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    data_dir: str,
+    output_dir: str,
+    steps: list[str],
+    pushdown: bool,
+    pipeline: bool,
+):
     """Convert recipes to NERD format via a series of steps"""
+    if "all" in steps:
+        steps = list(steps_dict.keys())
+    options = {"pushdown": pushdown, "pipeline": pipeline}
+    ctx.obj = {
+        "data_dir": Path(data_dir),
+        "output_dir": Path(output_dir),
+        "steps": steps,
+        "options": options,
+    }
+    if ctx.invoked_subcommand is not None:
+        return
+
     print("Welcome to the NERD Converter!")
 
     data_path = Path(data_dir)
@@ -36,23 +243,133 @@ def cli(data_dir: str, output_dir: str, steps: list[str]):
     if not data_path.exists():
         click.echo(f"Data directory {data_path} not found")
         return
-    output_path = Path(output_dir)
-    # We can create output directory if it doesn't exist
-    output_path.mkdir(parents=True, exist_ok=True)
+    if run_steps(data_path, Path(output_dir), steps, options):
+        click.echo("All steps completed successfully!")
 
-    if "all" in steps:
-        steps = list(steps_dict.keys())
 
-    for i, s in enumerate(steps):
-        print()
-        print(f"Running step {i+1}/{len(steps)}: {s}")
-        if s not in steps_dict:
-            click.echo(f"Step '{s}' not found")
-            return
-        if not steps_dict[s](data_path, output_path):
-            click.echo(f"Step '{s}' failed")
-            return
-    click.echo("All steps completed successfully!")
+@cli.command()
+@click.pass_context
+def status(ctx: click.Context):
+    """Report which steps have up-to-date cached outputs, without running them"""
+    data_path: Path = ctx.obj["data_dir"]
+    if not data_path.exists():
+        click.echo(f"Data directory {data_path} not found")
+        return
+    upstream_stale = False
+    for name, step in steps_dict.items():
+        status = step_status(data_path, step, ctx.obj["options"])
+        # Rebuilding an earlier step can change this step's input, so it can't be up to date either
+        if upstream_stale and status == "up to date":
+            status = "out of date (upstream)"
+        upstream_stale = upstream_stale or status != "up to date"
+        click.echo(f"{name}: {status}")
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--workers",
+    "-j",
+    type=int,
+    default=None,
+    help="Number of worker processes (defaults to the CPU count)",
+)
+@click.pass_context
+def batch(ctx: click.Context, manifest: str, workers: Optional[int]):
+    """
+    Convert every data directory listed in MANIFEST across a pool of workers.
+    Config, handlers and oredict indices are loaded once per distinct set of files and shared with every worker.
+    As with a single run, each dump's outputs are written into its data directory.
+    """
+    from tools.recipe_filterer import preload_indices
+
+    data_paths = read_manifest(Path(manifest))
+    missing = [p for p in data_paths if not p.exists()]
+    if missing:
+        for p in missing:
+            click.echo(f"Data directory {p} not found")
+        return
+    output_path: Path = ctx.obj["output_dir"]
+    steps: list[str] = ctx.obj["steps"]
+    options: dict[str, Any] = ctx.obj["options"]
+
+    # Load each distinct index set once here, then hand the results to every worker
+    index_sets: dict[tuple[str, ...], int] = {}
+    for p in data_paths:
+        index_set = get_index_set(p)
+        if index_set not in index_sets:
+            index_sets[index_set] = len(index_sets) + 1
+            preload_indices(p)
+    print(f"Loaded {len(index_sets)} distinct index set(s) for {len(data_paths)} dumps")
+
+    print(f"Converting {len(data_paths)} dumps...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=seed_loaded_by_hash,
+        initargs=(get_loaded_by_hash(),),
+    ) as executor:
+        futures = [
+            executor.submit(run_dump, p, output_path, steps, options)
+            for p in data_paths
+        ]
+        results = [f.result() for f in futures]
+
+    print()
+    print(f"Batch summary ({time.perf_counter() - start:.1f}s total):")
+    for p, result in zip(data_paths, results):
+        status = "ok" if result.success else "FAILED"
+        click.echo(
+            f"  {result.data_dir}: {status} in {result.seconds:.1f}s,"
+            f" index set #{index_sets[get_index_set(p)]},"
+            f" {result.indices_reused} indices reused, {result.indices_loaded} loaded"
+        )
+        if result.error:
+            click.echo(f"    {result.error}")
+        for output in result.outputs:
+            click.echo(f"    {output} ({output.stat().st_size / 2**20:.1f} MiB)")
+    failed = sum(not r.success for r in results)
+    if failed:
+        click.echo(f"{failed}/{len(results)} dumps failed")
+    else:
+        click.echo("All dumps completed successfully!")
+
+
+@cli.command()
+@click.argument("old_file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("new_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--report",
+    "-r",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the full diff as JSON to this file",
+)
+@click.option("--encoding", default="utf-8", help="Encoding of both recipe files")
+@click.option("--verbose", "-v", is_flag=True, help="List every differing recipe")
+def diff(
+    old_file: str, new_file: str, report: Optional[str], encoding: str, verbose: bool
+):
+    """Report recipes added, removed or changed between two recipe files (e.g. recipes_filtered.json)"""
+    from tools.recipe_differ import diff_recipes
+
+    result = diff_recipes(Path(old_file), Path(new_file), encoding)
+    click.echo(f"Added: {sum(len(e.new) for e in result.added)} recipes")
+    click.echo(f"Removed: {sum(len(e.old) for e in result.removed)} recipes")
+    click.echo(
+        f"Changed: {sum(len(e.old) for e in result.changed)} old"
+        f" -> {sum(len(e.new) for e in result.changed)} new recipes"
+        f" across {len(result.changed)} identities"
+    )
+    click.echo(f"Unchanged: {result.unchanged} recipes")
+    if verbose:
+        for sign, entries in (("+", result.added), ("-", result.removed), ("~", result.changed)):
+            for entry in entries:
+                click.echo(f"{sign} {format_diff_entry(entry)}")
+    if report:
+        with open(report, "w") as f:
+            f.write(result.model_dump_json())
+        click.echo(f"Wrote diff report to {report}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+import json
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# The repo isn't an installed package, so make tools importable however pytest is launched
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def run_cli(cwd: Path, *args: str, env: dict[str, str] | None = None) -> str:
+    """
+    Runs nerd_converter.py from cwd (where config.json is looked up) and returns its output.
+    """
+    result = subprocess.run(
+        [sys.executable, str(REPO_ROOT / "nerd_converter.py"), *args],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": str(REPO_ROOT), **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+@pytest.fixture
+def cached_data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Minimal data directory (with config.json in the working directory) where every step's output is up to date.
+    """
+    pytest.importorskip("json_stream")
+    from tools.cache_keys import get_filter_cache_key, get_preprocess_cache_key
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(
+        json.dumps(
+            {
+                "filter": {
+                    "handler_names": ["crafting"],
+                    "handler_mods": [],
+                    "exclude_handler_names": [],
+                    "exclude_recipes": [],
+                }
+            }
+        )
+    )
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "recipes.json").write_text('{"version": "test", "queries": []}')
+    (data_dir / "recipes_stacks.json").write_text('{"items": {}, "fluids": {}}')
+    (data_dir / "handlers.csv").write_text(
+        "Handler Recipe Name,Handler Class,Overlay Identifier,Mod DisplayName,ItemStack\n"
+        "Shaped Crafting,ShapedHandler,crafting,Minecraft,1xtile.workbench@0\n"
+    )
+    (data_dir / "oredict.csv").write_text(
+        "Ore Name,ItemStack,Item ID,Display Name,Wildcard\n"
+        "plankWood,1xtile.wood@0,minecraft:planks,Oak Wood Planks,false\n"
+    )
+    for output_file, get_cache_key in [
+        (data_dir / "recipes_preprocessed.json", get_preprocess_cache_key),
+        (data_dir / "recipes_filtered.json", get_filter_cache_key),
+    ]:
+        output_file.write_text(
+            json.dumps(
+                {
+                    "dump_version": "test",
+                    "dump_sha": "test",
+                    "cache_sha": get_cache_key(data_dir),
+                    "recipes": [],
+                }
+            )
+        )
+    return data_dir
+
+
+def write_dump(data_dir: Path, num_queries: int):
+    """
+    Writes a small, reproducible recipes.json with both generic and GregTech recipes.
+    """
+    rng = random.Random(0)
+
+    def slot():
+        return {"itemSlug": f"i{rng.randrange(50)}d0", "count": rng.randint(1, 4)}
+
+    def greg_recipe():
+        return {
+            "mInputs": [slot(), None],
+            "mOutputs": [slot()],
+            "mFluidInputs": [{"fluidSlug": "water", "amount": 1000}],
+            "mFluidOutputs": [],
+            "mDuration": rng.randint(1, 200),
+            "mEUt": rng.choice([8, 32, 128]),
+            "mSpecialValue": 0,
+            "mEnabled": True,
+            "mHidden": False,
+            "mFakeRecipe": False,
+            "mCanBeBuffered": True,
+            "mNeedsEmptyOutput": False,
+            "isNBTSensitive": False,
+            "metadataStorage": {},
+        }
+
+    queries = []
+    for _ in range(num_queries):
+        handlers = []
+        for machine in ["Shaped Crafting", "Assembler"]:
+            if machine == "Assembler":
+                recipes = [{"greg_data": greg_recipe()} for _ in range(3)]
+            else:
+                recipes = [
+                    {"generic": {"ingredients": [slot(), slot()], "otherStacks": [], "outItem": slot()}}
+                    for _ in range(3)
+                ]
+            handlers.append({"recipes": recipes, "id": machine, "name": machine, "tab_name": machine})
+        queries.append({"handlers": handlers, "query_item": slot()})
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (data_dir / "recipes.json").write_text(json.dumps({"version": "test", "queries": queries}))
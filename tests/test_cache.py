@@ -0,0 +1,44 @@
+"""
+Cache invalidation: a step is only up to date if none of its inputs, or any earlier step, changed.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from conftest import run_cli
+
+pytest.importorskip("click")
+
+
+def test_everything_up_to_date(cached_data_dir: Path):
+    output = run_cli(cached_data_dir.parent, "status")
+    assert "preprocess: up to date" in output
+    assert "filter: up to date" in output
+
+
+def test_config_change_invalidates_filter(cached_data_dir: Path):
+    config_file = cached_data_dir.parent / "config.json"
+    config = json.loads(config_file.read_text())
+    config["filter"]["handler_names"] = []
+    config_file.write_text(json.dumps(config))
+
+    output = run_cli(cached_data_dir.parent, "status")
+    assert "preprocess: up to date" in output
+    assert "filter: out of date" in output
+
+
+@pytest.mark.parametrize("filename", ["recipes_stacks.json", "handlers.csv", "oredict.csv"])
+def test_filter_input_change_invalidates_filter(cached_data_dir: Path, filename: str):
+    with open(cached_data_dir / filename, "a") as f:
+        f.write("\n")
+    output = run_cli(cached_data_dir.parent, "status")
+    assert "filter: out of date" in output
+
+
+def test_stale_upstream_invalidates_later_steps(cached_data_dir: Path):
+    (cached_data_dir / "recipes.json").write_text('{"version": "test2", "queries": []}')
+    output = run_cli(cached_data_dir.parent, "status")
+    assert "preprocess: out of date" in output
+    assert "filter: out of date (upstream)" in output
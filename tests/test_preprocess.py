@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import run_cli, write_dump
+
+pytest.importorskip("click")
+pytest.importorskip("json_stream")
+pytest.importorskip("pydantic")
+
+
+def preprocess(data_dir: Path, *args: str, env: dict[str, str] | None = None) -> bytes:
+    output_file = data_dir / "recipes_preprocessed.json"
+    output_file.unlink(missing_ok=True)
+    run_cli(data_dir.parent, "-d", str(data_dir), "-s", "preprocess", *args, env=env)
+    return output_file.read_bytes()
+
+
+def test_pipeline_matches_sequential(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    write_dump(data_dir, 50)
+    assert preprocess(data_dir, "--pipeline") == preprocess(data_dir)
+
+
+def test_output_is_independent_of_hash_seed(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    write_dump(data_dir, 50)
+    first = preprocess(data_dir, env={"PYTHONHASHSEED": "1"})
+    second = preprocess(data_dir, env={"PYTHONHASHSEED": "2"})
+    assert first == second
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("json_stream")
+pytest.importorskip("pydantic")
+
+from tools.fingerprint import recipe_content, recipe_identity  # noqa: E402
+from tools.recipe_differ import diff_recipes  # noqa: E402
+
+
+def stack(slug: str, amount: int | float = 1, type: str = "item") -> dict:
+    return {"type": type, "slug": slug, "amount": amount}
+
+
+def recipe(machine: str, inputs: list[dict], outputs: list[dict], eut: int | None = None) -> dict:
+    return {
+        "inputs": inputs,
+        "outputs": outputs,
+        "machine": machine,
+        "meta": {"EUt": eut, "ticks": 20} if eut is not None else None,
+    }
+
+
+def write_recipe_file(path: Path, dump_sha: str, recipes: list[dict]) -> Path:
+    path.write_text(json.dumps({"dump_version": "test", "dump_sha": dump_sha, "recipes": recipes}))
+    return path
+
+
+def test_identity_ignores_order_amounts_and_meta():
+    a = recipe("Assembler", [stack("a", 1), stack("b", 2)], [stack("c")], eut=32)
+    b = recipe("Assembler", [stack("b", 5), stack("a", 1)], [stack("c", 3)])
+    assert recipe_identity(a) == recipe_identity(b)
+    assert recipe_identity(a) != recipe_identity(recipe("Mixer", a["inputs"], a["outputs"]))
+    assert recipe_identity(a) != recipe_identity(recipe("Assembler", a["inputs"], [stack("c", type="fluid")]))
+
+
+def test_content_covers_amounts_and_meta_but_not_order():
+    a = recipe("Assembler", [stack("a", 1), stack("b", 2)], [stack("c")], eut=32)
+    assert recipe_content(a) == recipe_content(recipe("Assembler", [stack("b", 2), stack("a", 1.0)], [stack("c")], eut=32))
+    assert recipe_content(a) != recipe_content(recipe("Assembler", a["inputs"], a["outputs"], eut=128))
+    assert recipe_content(a) != recipe_content(recipe("Assembler", a["inputs"], [stack("c", 2)], eut=32))
+
+
+def test_diff_categories(tmp_path: Path):
+    unchanged = recipe("Crafting", [stack("plank", 4)], [stack("table")])
+    changed_old = recipe("Assembler", [stack("plate")], [stack("casing")], eut=32)
+    changed_new = recipe("Assembler", [stack("plate")], [stack("casing")], eut=128)
+    removed = recipe("Macerator", [stack("ore")], [stack("dust", 2)], eut=2)
+    added = recipe("Mixer", [stack("dust")], [stack("water", 1000, type="fluid")], eut=8)
+    # An identity that keeps one variant and loses another
+    kept_variant = recipe("Furnace", [stack("sand")], [stack("glass", 1)])
+    lost_variant = recipe("Furnace", [stack("sand")], [stack("glass", 2)])
+    # An identity that keeps its variant and gains another
+    old_variant = recipe("Compressor", [stack("dust")], [stack("plate", 1)], eut=2)
+    extra_variant = recipe("Compressor", [stack("dust")], [stack("plate", 3)], eut=2)
+
+    old_file = write_recipe_file(
+        tmp_path / "old.json",
+        "old",
+        [unchanged, changed_old, removed, kept_variant, lost_variant, old_variant],
+    )
+    new_file = write_recipe_file(
+        tmp_path / "new.json",
+        "new",
+        [extra_variant, old_variant, kept_variant, added, changed_new, unchanged],
+    )
+    diff = diff_recipes(old_file, new_file)
+
+    assert (diff.old_sha, diff.new_sha) == ("old", "new")
+    assert diff.unchanged == 3  # unchanged, kept_variant, old_variant
+
+    by_machine = lambda entries: {e.machine: e for e in entries}  # noqa: E731
+    added_entries = by_machine(diff.added)
+    removed_entries = by_machine(diff.removed)
+    changed_entries = by_machine(diff.changed)
+    assert set(added_entries) == {"Mixer", "Compressor"}
+    assert set(removed_entries) == {"Macerator"}
+    assert set(changed_entries) == {"Assembler", "Furnace"}
+
+    mixer = added_entries["Mixer"]
+    assert mixer.old == []
+    assert [(s.type, s.slug) for s in mixer.outputs] == [("fluid", "water")]
+    assert [v.outputs[0].amount for v in added_entries["Compressor"].new] == [3]
+    assert added_entries["Compressor"].old == []
+
+    macerator = removed_entries["Macerator"]
+    assert [(s.type, s.slug) for s in macerator.inputs] == [("item", "ore")]
+    assert macerator.new == []
+    assert macerator.old[0].outputs[0].amount == 2
+
+    assembler = changed_entries["Assembler"]
+    assert [v.meta.EUt for v in assembler.old] == [32]
+    assert [v.meta.EUt for v in assembler.new] == [128]
+
+    furnace = changed_entries["Furnace"]
+    assert [v.outputs[0].amount for v in furnace.old] == [2]
+    assert furnace.new == []
+
+
+def test_identical_files(tmp_path: Path):
+    recipes = [recipe("Crafting", [stack("plank", 4)], [stack("table")])] * 2
+    old_file = write_recipe_file(tmp_path / "old.json", "sha", recipes)
+    new_file = write_recipe_file(tmp_path / "new.json", "sha", recipes)
+    diff = diff_recipes(old_file, new_file)
+    assert (diff.added, diff.removed, diff.changed, diff.unchanged) == ([], [], [], 2)
@@ -0,0 +1,60 @@
+"""
+Import-time regression checks: --help, status and fully cached runs must not import pandas or pydantic.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("click")
+pytest.importorskip("json_stream")
+
+# Runs the CLI in-process (so sys.modules can be inspected), then prints which heavy modules got imported
+SCRIPT = """
+import sys
+from click.testing import CliRunner
+import nerd_converter
+
+result = CliRunner().invoke(nerd_converter.cli, sys.argv[1:])
+assert result.exit_code == 0, result.output
+print(result.output)
+print("imported:" + ",".join(m for m in ("pandas", "pydantic") if m in sys.modules))
+"""
+
+
+def run_and_check_imports(cwd: Path, *args: str) -> tuple[str, list[str]]:
+    """
+    Returns the CLI's output and the heavy modules it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, *args],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": str(REPO_ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    output, _, imported = result.stdout.strip().rpartition("imported:")
+    return output, [m for m in imported.split(",") if m]
+
+
+def test_help_is_lightweight(tmp_path: Path):
+    _, imported = run_and_check_imports(tmp_path, "--help")
+    assert imported == []
+
+
+def test_status_is_lightweight(cached_data_dir: Path):
+    output, imported = run_and_check_imports(cached_data_dir.parent, "status")
+    assert "filter: up to date" in output
+    assert imported == []
+
+
+def test_cached_run_is_lightweight(cached_data_dir: Path):
+    output, imported = run_and_check_imports(cached_data_dir.parent)
+    assert output.count("Cached output is up to date, skipping") == 2
+    assert imported == []
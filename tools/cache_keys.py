@@ -0,0 +1,65 @@
+"""
+Cache keys for each step's output, stored as cache_sha in the output file.
+Kept free of pandas/pydantic imports so status checks and fully cached runs stay fast.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+from tools.util import (
+    CONFIG_PATH,
+    HANDLERS_FILENAME,
+    OREDICT_FILENAME,
+    RECIPES_INPUT_FILENAME,
+    RECIPES_PREPROCESSED_FILENAME,
+    STACKS_FILENAME,
+    combine_hashes,
+    get_hash,
+    get_pushdown_hash,
+)
+
+
+def get_pushdown_inputs(data_dir: Path) -> list[Path]:
+    return [data_dir / HANDLERS_FILENAME, Path(CONFIG_PATH)]
+
+
+def get_preprocess_cache_key(
+    data_dir: Path, pushdown: bool = False, pipeline: bool = False
+) -> Optional[str]:
+    """
+    Returns the cache key preprocess_recipes would use, or None if an input it needs is missing.
+    Pipelining doesn't change the output, so it doesn't change the key.
+    """
+    input_file = data_dir / RECIPES_INPUT_FILENAME
+    if not input_file.exists():
+        return None
+    sha = get_hash(input_file)
+    if pushdown:
+        if not all(file.exists() for file in get_pushdown_inputs(data_dir)):
+            return None
+        # Only needed (along with pandas) when pushing down
+        from tools.recipe_preprocessor import load_pushdown_machines
+
+        return get_pushdown_hash(sha, load_pushdown_machines(data_dir))
+    return sha
+
+
+def get_filter_inputs(data_dir: Path) -> list[Path]:
+    return [
+        data_dir / RECIPES_PREPROCESSED_FILENAME,
+        data_dir / STACKS_FILENAME,
+        data_dir / HANDLERS_FILENAME,
+        data_dir / OREDICT_FILENAME,
+        Path(CONFIG_PATH),
+    ]
+
+
+def get_filter_cache_key(data_dir: Path) -> Optional[str]:
+    """
+    Returns the cache key filter_recipes would use, or None if an input it needs is missing.
+    The filtered output depends on every one of its inputs, not just the preprocessed recipes.
+    """
+    files = get_filter_inputs(data_dir)
+    if not all(file.exists() for file in files):
+        return None
+    return combine_hashes(*(get_hash(file) for file in files))
@@ -0,0 +1,40 @@
+# Recipe diff report format
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+from tools.nerd_format import GregMeta, Stack
+
+
+class StackKey(BaseModel):
+    type: Literal["item", "fluid"]
+    slug: str
+
+
+class RecipeVariant(BaseModel):
+    # The parts of a recipe that can change without changing its identity
+    inputs: List[Stack]
+    outputs: List[Stack]
+    meta: Optional[GregMeta] = None
+
+
+class DiffEntry(BaseModel):
+    identity: str  # tools.fingerprint.recipe_identity
+    machine: str
+    inputs: List[StackKey]
+    outputs: List[StackKey]
+    # Variants only in the old file
+    old: List[RecipeVariant]
+    # Variants only in the new file
+    new: List[RecipeVariant]
+
+
+class RecipeDiff(BaseModel):
+    old_sha: str | None
+    new_sha: str | None
+    # Variants only in the new file, whether or not the identity already existed
+    added: List[DiffEntry]
+    # Identities no longer in the new file at all
+    removed: List[DiffEntry]
+    # Identities still in the new file that lost variants, e.g. different amounts/meta
+    changed: List[DiffEntry]
+    unchanged: int  # Number of recipes present in both files
@@ -0,0 +1,76 @@
+"""
+Stable recipe fingerprints and ordering that don't depend on Python's randomized hashing (PYTHONHASHSEED).
+Fingerprints work on plain recipe dicts (as dumped from tools.nerd_format.Recipe) so recipe files can be streamed without validation.
+"""
+
+import hashlib
+import json
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tools.nerd_format import Recipe
+
+
+def _digest(payload) -> str:
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _amount(amount: int | float) -> int | float:
+    # 1 and 1.0 should fingerprint the same
+    if isinstance(amount, float) and amount.is_integer():
+        return int(amount)
+    return amount
+
+
+def _stack_keys(stacks: list[dict]) -> list[list[str]]:
+    return sorted([s["type"], s["slug"]] for s in stacks)
+
+
+def _stack_contents(stacks: list[dict]) -> list[list]:
+    return sorted([s["type"], s["slug"], _amount(s["amount"])] for s in stacks)
+
+
+def recipe_identity(recipe: dict) -> str:
+    """
+    Fingerprint of what a recipe is, keyed like Recipe.__hash__: machine plus input/output types and slugs, ignoring amounts and meta.
+    Stack order doesn't matter.
+    """
+    return _digest(
+        [recipe["machine"], _stack_keys(recipe["inputs"]), _stack_keys(recipe["outputs"])]
+    )
+
+
+def recipe_content(recipe: dict) -> str:
+    """
+    Fingerprint of everything in a recipe, including amounts and GregMeta EUt/ticks.
+    """
+    meta = recipe.get("meta")
+    return _digest(
+        [
+            recipe["machine"],
+            _stack_contents(recipe["inputs"]),
+            _stack_contents(recipe["outputs"]),
+            [meta["EUt"], meta["ticks"]] if meta else None,
+        ]
+    )
+
+
+def recipe_sort_key(recipe: "Recipe") -> tuple:
+    """
+    Canonical ordering key for Recipe models: machine, then input/output types and slugs (like recipe_identity),
+    then amounts and meta. Built only from recipe contents, so sorting by it gives byte-identical output across runs.
+    """
+    inputs = sorted((s.type, s.slug, _amount(s.amount)) for s in recipe.inputs)
+    outputs = sorted((s.type, s.slug, _amount(s.amount)) for s in recipe.outputs)
+    return (
+        recipe.machine,
+        [s[:2] for s in inputs],
+        [s[:2] for s in outputs],
+        inputs,
+        outputs,
+        (recipe.meta.EUt, recipe.meta.ticks) if recipe.meta else (),
+        # Tie-break recipes that only differ in stack order
+        [(s.type, s.slug, s.amount) for s in recipe.inputs],
+        [(s.type, s.slug, s.amount) for s in recipe.outputs],
+    )
@@ -40,5 +40,7 @@ class Recipe(BaseModel):
 
 class RecipeFile(BaseModel):
     dump_version: str
-    dump_sha: str
+    dump_sha: str  # Hash of the original recipes.json dump
+    # Hash of the input this file was built from, used as its cache key. Must stay before recipes so it can be read without streaming them
+    cache_sha: Optional[str] = None
     recipes: List[Recipe]
@@ -0,0 +1,151 @@
+import io
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Callable, Generic, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Marks the end of a stage's output in its queue
+_DONE = object()
+
+
+class StageStats:
+    """
+    Throughput counters for one pipeline stage.
+    busy is time spent producing items, blocked is time waiting on a full queue (i.e. downstream is slower),
+    and starved is time the consumer spent waiting on an empty queue (i.e. this stage is slower).
+    Stages that run on the consumer's thread have no queue, so only report items and busy time.
+    """
+
+    def __init__(self, name: str, threaded: bool = True):
+        self.name = name
+        self.threaded = threaded
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.starved = 0.0
+
+    def __str__(self):
+        rate = self.items / self.busy if self.busy else 0.0
+        text = f"{self.name}: {self.items} items ({rate:.0f}/s busy)"
+        if self.bytes:
+            text += f", {self.bytes / 2**20:.1f} MiB"
+        text += f", busy {self.busy:.2f}s"
+        if self.threaded:
+            text += f", blocked on downstream {self.blocked:.2f}s, downstream starved {self.starved:.2f}s"
+        return text
+
+
+class ThreadedStage(Generic[T]):
+    """
+    Runs a producer on a background thread, handing its items to the consumer through a bounded queue.
+    The producer blocks when the queue is full, so a slow consumer applies backpressure instead of buffering everything.
+    Exceptions in the producer are re-raised in the consumer.
+    If the producer consumes another stage, pass it as upstream so time spent waiting on it isn't counted as busy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        produce: Callable[[], Iterable[T]],
+        maxsize: int,
+        upstream: Optional["ThreadedStage"] = None,
+    ):
+        self.stats = StageStats(name)
+        self._produce = produce
+        self._upstream = upstream
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                self.stats.blocked += time.perf_counter() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            iterator = iter(self._produce())
+            while True:
+                start = time.perf_counter()
+                # Upstream starvation is accumulated on this thread while it pulls from upstream inside next()
+                upstream_starved = self._upstream.stats.starved if self._upstream else 0.0
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    waited = (
+                        self._upstream.stats.starved - upstream_starved
+                        if self._upstream
+                        else 0.0
+                    )
+                    self.stats.busy += time.perf_counter() - start - waited
+                self.stats.items += 1
+                if isinstance(item, (bytes, bytearray)):
+                    self.stats.bytes += len(item)
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self._error = e
+        self._put(_DONE)
+
+    def __iter__(self) -> Iterator[T]:
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._queue.get()
+                self.stats.starved += time.perf_counter() - start
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        # Unblocks the producer if the consumer stops early
+        self._stop.set()
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    File-like view over an iterable of byte chunks, so stream parsers can read from a reader stage.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, b"")
+            if not chunk:
+                return 0
+            self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        # Slicing a memoryview doesn't copy, which matters with large chunks and small reads
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def read_chunks(path: Path, chunk_size: int) -> Iterator[bytes]:
+    with path.open("rb", buffering=0) as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
@@ -0,0 +1,107 @@
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+import json_stream
+import json_stream.base
+
+from tools.diff_format import DiffEntry, RecipeDiff, RecipeVariant, StackKey
+from tools.fingerprint import recipe_content, recipe_identity
+from tools.util import read_recipe_file_header
+
+# identity -> content fingerprint counts
+# A file can hold several recipes with the same identity (e.g. different amounts), so contents is a multiset
+RecipeIndex = dict[str, Counter[str]]
+
+
+def iter_recipe_dicts(file: Path, encoding="utf-8") -> Iterator[dict]:
+    """
+    Streams recipes out of a RecipeFile one at a time, as plain dicts.
+    """
+    with open(file, "r", encoding=encoding) as f:
+        recipe_file = json_stream.load(f)
+        assert isinstance(recipe_file, json_stream.base.TransientStreamingJSONObject)
+        for recipe_json in recipe_file["recipes"].persistent():
+            recipe = json_stream.to_standard_types(recipe_json)
+            assert isinstance(recipe, dict)
+            yield recipe
+
+
+def index_recipes(file: Path, encoding="utf-8") -> RecipeIndex:
+    # Only fingerprints are kept in memory, never whole recipes
+    index: RecipeIndex = {}
+    for recipe in iter_recipe_dicts(file, encoding):
+        contents = index.setdefault(recipe_identity(recipe), Counter())
+        contents[recipe_content(recipe)] += 1
+    return index
+
+
+def collect_variants(
+    file: Path,
+    wanted: dict[str, Counter[str]],
+    entries: dict[str, DiffEntry],
+    old: bool,
+    encoding="utf-8",
+):
+    """
+    Second pass over a file: fills in details for the recipes whose (identity, content) is in wanted.
+    Only differing recipes are ever loaded in full.
+    """
+    for recipe in iter_recipe_dicts(file, encoding):
+        identity = recipe_identity(recipe)
+        if identity not in wanted:
+            continue
+        content = recipe_content(recipe)
+        if wanted[identity][content] <= 0:
+            continue
+        wanted[identity][content] -= 1
+        if identity not in entries:
+            entries[identity] = DiffEntry(
+                identity=identity,
+                machine=recipe["machine"],
+                inputs=[
+                    StackKey(type=s["type"], slug=s["slug"]) for s in recipe["inputs"]
+                ],
+                outputs=[
+                    StackKey(type=s["type"], slug=s["slug"]) for s in recipe["outputs"]
+                ],
+                old=[],
+                new=[],
+            )
+        variant = RecipeVariant(
+            inputs=recipe["inputs"], outputs=recipe["outputs"], meta=recipe.get("meta")
+        )
+        (entries[identity].old if old else entries[identity].new).append(variant)
+
+
+def diff_recipes(old_file: Path, new_file: Path, encoding="utf-8") -> RecipeDiff:
+    old_index = index_recipes(old_file, encoding)
+    new_index = index_recipes(new_file, encoding)
+
+    # Content fingerprints that only appear on one side, per identity
+    old_only: dict[str, Counter[str]] = {}
+    new_only: dict[str, Counter[str]] = {}
+    unchanged = 0
+    for identity in old_index.keys() | new_index.keys():
+        old_contents = old_index.get(identity, Counter())
+        new_contents = new_index.get(identity, Counter())
+        unchanged += sum((old_contents & new_contents).values())
+        if old_contents != new_contents:
+            old_only[identity] = old_contents - new_contents
+            new_only[identity] = new_contents - old_contents
+    new_identities = set(new_index)
+    del old_index, new_index
+
+    entries: dict[str, DiffEntry] = {}
+    collect_variants(old_file, old_only, entries, old=True, encoding=encoding)
+    collect_variants(new_file, new_only, entries, old=False, encoding=encoding)
+
+    return RecipeDiff(
+        old_sha=read_recipe_file_header(old_file, "dump_sha"),
+        new_sha=read_recipe_file_header(new_file, "dump_sha"),
+        added=[e for e in entries.values() if not e.old],
+        removed=[e for e in entries.values() if e.identity not in new_identities],
+        changed=[
+            e for e in entries.values() if e.old and e.identity in new_identities
+        ],
+        unchanged=unchanged,
+    )
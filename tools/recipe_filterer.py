@@ -1,17 +1,19 @@
 from pathlib import Path
 import pandas as pd
+from tools.cache_keys import get_filter_cache_key, get_filter_inputs
 from tools.config_format import Config, IngredientListFilter, RecipeFilter
 from tools.dump_format import RecipeStacks
 from tools.nerd_format import Recipe, RecipeFile, Stack
 
 from tools.util import (
+    CONFIG_PATH,
     HANDLERS_FILENAME,
     OREDICT_FILENAME,
     RECIPES_FILTERED_FILENAME,
     RECIPES_PREPROCESSED_FILENAME,
     STACKS_FILENAME,
     check_cache_up_to_date,
-    get_hash,
+    load_by_hash,
     load_config,
     parse_json,
 )
@@ -76,6 +78,31 @@ def prepare_item_df(stacks: RecipeStacks, oredict: pd.DataFrame):
     return item_df
 
 
+def read_oredict(oredict_file: Path) -> pd.DataFrame:
+    return pd.read_csv(oredict_file, index_col="ItemStack")
+
+
+def load_slug_matches(stacks_file: Path, oredict_file: Path, config_file: Path):
+    stacks = parse_json(stacks_file, RecipeStacks)
+    oredict = load_by_hash(read_oredict, oredict_file)
+    config = load_by_hash(load_config, config_file)
+    item_df = prepare_item_df(stacks, oredict)
+    return prepare_matches(config, item_df)
+
+
+def preload_indices(data_dir: Path):
+    """
+    Loads the config, handlers and oredict for data_dir into the load_by_hash cache, skipping any that are missing.
+    """
+    config_file = Path(CONFIG_PATH)
+    if config_file.exists():
+        load_by_hash(load_config, config_file)
+    if (data_dir / HANDLERS_FILENAME).exists():
+        load_by_hash(pd.read_csv, data_dir / HANDLERS_FILENAME)
+    if (data_dir / OREDICT_FILENAME).exists():
+        load_by_hash(read_oredict, data_dir / OREDICT_FILENAME)
+
+
 def get_allowed_machines(config: Config, handlers: pd.DataFrame):
     return set(
         handlers[
@@ -168,25 +195,25 @@ def filter_recipes(data_dir: Path, output_dir: Path) -> bool:
     oredict_file = data_dir / OREDICT_FILENAME
     output_file = data_dir / RECIPES_FILTERED_FILENAME
 
-    for file in [input_file, stacks_file, handlers_file, oredict_file]:
+    for file in get_filter_inputs(data_dir):
         if not file.exists():
             print(f"Required input {file} does not exist, cannot filter recipes")
             return False
 
-    sha = get_hash(input_file)
+    sha = get_filter_cache_key(data_dir)
+    assert sha is not None
     if check_cache_up_to_date(output_file, sha):
         return True
 
-    print("Loading preprocessed recipes, stacks, config, handlers, and oredict...")
+    print("Loading preprocessed recipes, config, and handlers...")
     recipes = parse_json(input_file, RecipeFile, encoding="cp1252")
-    stacks = parse_json(stacks_file, RecipeStacks)
-    config = load_config()
-    handlers = pd.read_csv(handlers_file)
-    oredict = pd.read_csv(oredict_file, index_col="ItemStack")
+    # Config, handlers and lookups are reused across batch runs when their files are identical
+    config_file = Path(CONFIG_PATH)
+    config = load_by_hash(load_config, config_file)
+    handlers = load_by_hash(pd.read_csv, handlers_file)
 
     print("Preparing item data and oredict lookups...")
-    item_df = prepare_item_df(stacks, oredict)
-    slug_matches = prepare_matches(config, item_df)
+    slug_matches = load_by_hash(load_slug_matches, stacks_file, oredict_file, config_file)
 
     print("Filtering recipes...")
     allowed_machines = get_allowed_machines(config, handlers)
@@ -214,6 +241,7 @@ def filter_recipes(data_dir: Path, output_dir: Path) -> bool:
             RecipeFile(
                 dump_version=recipes.dump_version,
                 dump_sha=recipes.dump_sha,
+                cache_sha=sha,
                 recipes=filtered_recipes,
             ).model_dump_json()
         )
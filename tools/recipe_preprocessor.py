@@ -1,17 +1,33 @@
 from pathlib import Path
-from typing import Sequence, Tuple, Optional
+import time
+from typing import Iterable, Iterator, Sequence, Tuple, Optional
 import json_stream
 import json_stream.base
 
+from tools.cache_keys import get_pushdown_inputs
 from tools.dump_format import MinimalItem, MinimalFluid, ItemSlot, QueryDump
 from tools.nerd_format import RecipeFile, Stack, Recipe, GregMeta
+from tools.fingerprint import recipe_sort_key
+from tools.pipeline import ChunkReader, StageStats, ThreadedStage, read_chunks
 from tools.util import (
+    CONFIG_PATH,
+    HANDLERS_FILENAME,
     RECIPES_PREPROCESSED_FILENAME,
     RECIPES_INPUT_FILENAME,
     check_cache_up_to_date,
     get_hash,
+    get_pushdown_hash,
+    load_by_hash,
+    load_config,
 )
 
+# Used with pipeline=True: large reads keep the disk busy while the parser works, and the queues bound how far ahead
+# each stage can get. Parsing and normalizing are CPU-bound Python and share the GIL, so only the reads truly overlap;
+# on local disks this is no faster than reading sequentially, but the per-stage counters show where time goes.
+READ_CHUNK_SIZE = 4 * 2**20
+READ_QUEUE_SIZE = 8
+PARSE_QUEUE_SIZE = 256
+
 
 def intify(amount: float):
     if amount.is_integer():
@@ -64,12 +80,80 @@ def stackngroup_chances(
     return groupify(stacks)
 
 
-def preprocess_recipes(data_dir: Path, output_dir: Path) -> bool:
+def parse_queries(
+    stream, header: dict, allowed_machines: Optional[set[str]]
+) -> Iterator[dict]:
+    """
+    Tokenizes the recipe dump from a binary stream, yielding each query as plain (unvalidated) dicts.
+    The dump version is stored in header as soon as it's read.
+    """
+    recipes_file = json_stream.load(stream)
+    assert isinstance(recipes_file, json_stream.base.TransientStreamingJSONObject)
+    header["version"] = recipes_file["version"]
+    print("Recipe dumper version:", header["version"])
+
+    for query_json in recipes_file["queries"].persistent():
+        # Loading an entire query at once is fine because it's a fairly small amount of data
+        query_loaded = json_stream.to_standard_types(query_json)
+        assert isinstance(query_loaded, dict)
+        if allowed_machines is not None:
+            # Drop handlers the filter step would discard anyway, before paying to validate them
+            query_loaded["handlers"] = [
+                h for h in query_loaded["handlers"] if h["tab_name"] in allowed_machines
+            ]
+            if not query_loaded["handlers"]:
+                continue
+        yield query_loaded
+
+
+def read_queries(
+    input_file: Path, header: dict, allowed_machines: Optional[set[str]]
+) -> Iterator[dict]:
+    with input_file.open("rb") as f:
+        yield from parse_queries(f, header, allowed_machines)
+
+
+def parse_chunks(
+    reader: ThreadedStage[bytes], header: dict, allowed_machines: Optional[set[str]]
+) -> Iterator[dict]:
+    try:
+        yield from parse_queries(ChunkReader(reader), header, allowed_machines)
+    finally:
+        reader.close()
+
+
+def load_pushdown_machines(data_dir: Path) -> set[str]:
+    """
+    Computes the set of machines the filter step would allow, so their handlers can be skipped at parse time.
+    """
+    # Pandas is only needed for pushdown, so don't pay for it otherwise
+    import pandas as pd
+    from tools.recipe_filterer import get_allowed_machines
+
+    handlers = load_by_hash(pd.read_csv, data_dir / HANDLERS_FILENAME)
+    config = load_by_hash(load_config, Path(CONFIG_PATH))
+    return get_allowed_machines(config, handlers)
+
+
+def preprocess_recipes(
+    data_dir: Path, output_dir: Path, pushdown: bool = False, pipeline: bool = False
+) -> bool:
     input_file = data_dir / RECIPES_INPUT_FILENAME
     output_file = data_dir / RECIPES_PREPROCESSED_FILENAME
 
+    allowed_machines: Optional[set[str]] = None
     sha = get_hash(input_file)
-    if check_cache_up_to_date(output_file, sha):
+    # Same as sha unless a predicate is pushed down; sha always identifies the dump
+    cache_sha = sha
+    if pushdown:
+        for file in get_pushdown_inputs(data_dir):
+            if not file.exists():
+                print(f"Required input {file} does not exist, cannot push down filter")
+                return False
+        allowed_machines = load_pushdown_machines(data_dir)
+        print(f"Pushing down filter: only keeping recipes from {len(allowed_machines)} machines")
+        cache_sha = get_pushdown_hash(sha, allowed_machines)
+    if check_cache_up_to_date(output_file, cache_sha):
         return True
 
     print("Loading recipes...")
@@ -78,64 +162,80 @@ def preprocess_recipes(data_dir: Path, output_dir: Path) -> bool:
     # because there can be a separate recipe for each output
     generic_recipes: dict[tuple[Tuple, str], list] = {}
     counter = 0
-    version = "unknown"
-    with input_file.open("rb") as f:
-        recipes_file = json_stream.load(f)
-        assert isinstance(recipes_file, json_stream.base.TransientStreamingJSONObject)
-        version = recipes_file["version"]
-        print("Recipe dumper version:", version)
-
-        for query_json in recipes_file["queries"].persistent():
-            # Loading an entire query at once is fine because it's a fairly small amount of data
-            query_loaded = json_stream.to_standard_types(query_json)
-            assert isinstance(query_loaded, dict)
-            query = QueryDump(**query_loaded)
-            for handler in query.handlers:
-                for recipe in handler.recipes:
-                    assert (
-                        recipe.generic or recipe.greg_data
-                    ), "Recipe has neither generic nor greg_data"
-                    if counter % 100 == 0:
-                        print(f"Processing recipe {counter}", end="\r")
-                    counter += 1
-                    inputs = []
-                    outputs = []
-                    if recipe.generic:
-                        # For generic recipes, the otherStacks field is *usually* something like fuel or catalysts that are not consumed
-                        # This is a big assumption that is not always true.
-                        # However, if the recipe has no output, it's probably a handler that lists outputs in the otherStacks field
-                        # This is also a big assumption that is not always true.
-                        outputs = (
-                            [stackify(recipe.generic.outItem)]
-                            if recipe.generic.outItem
-                            else stackngroup(recipe.generic.otherStacks)
-                        )
+    header = {"version": "unknown"}
+    queries: Iterable[dict]
+    stages: list[ThreadedStage] = []
+    if pipeline:
+        reader = ThreadedStage(
+            "reader", lambda: read_chunks(input_file, READ_CHUNK_SIZE), READ_QUEUE_SIZE
+        )
+        parser = ThreadedStage(
+            "parser",
+            lambda: parse_chunks(reader, header, allowed_machines),
+            PARSE_QUEUE_SIZE,
+            upstream=reader,
+        )
+        queries = parser
+        stages = [reader, parser]
+    else:
+        queries = read_queries(input_file, header, allowed_machines)
+    normalizer_stats = StageStats("normalizer", threaded=False)
+    for query_loaded in queries:
+        start = time.perf_counter()
+        query = QueryDump(**query_loaded)
+        for handler in query.handlers:
+            for recipe in handler.recipes:
+                assert (
+                    recipe.generic or recipe.greg_data
+                ), "Recipe has neither generic nor greg_data"
+                if counter % 100 == 0:
+                    print(f"Processing recipe {counter}", end="\r")
+                counter += 1
+                inputs = []
+                outputs = []
+                if recipe.generic:
+                    # For generic recipes, the otherStacks field is *usually* something like fuel or catalysts that are not consumed
+                    # This is a big assumption that is not always true.
+                    # However, if the recipe has no output, it's probably a handler that lists outputs in the otherStacks field
+                    # This is also a big assumption that is not always true.
+                    outputs = (
+                        [stackify(recipe.generic.outItem)]
+                        if recipe.generic.outItem
+                        else stackngroup(recipe.generic.otherStacks)
+                    )
 
-                        # Accumulate overlapping ingredients+handlers -> Multiple outputs
-                        # This assumes there are no duplicates of recipes that list outputs as otherStacks
-                        key = (tuple(recipe.generic.ingredients), handler.tab_name)
-                        generic_recipes[key] = generic_recipes.get(key, []) + outputs
-                    elif recipe.greg_data:
-                        inputs = stackngroup(
-                            recipe.greg_data.mInputs + recipe.greg_data.mFluidInputs
-                        )
-                        outputs = stackngroup_chances(
-                            recipe.greg_data.mOutputs, recipe.greg_data.mChances
-                        ) + stackngroup(recipe.greg_data.mFluidOutputs)
-                        meta = GregMeta(
-                            EUt=recipe.greg_data.mEUt, ticks=recipe.greg_data.mDuration
-                        )
-                        # Greg recipes can be added directly as each copy of a recipe will be the same
-                        final_recipes_set.add(
-                            Recipe(
-                                inputs=inputs,
-                                outputs=outputs,
-                                machine=handler.tab_name,
-                                meta=meta,
-                            )
+                    # Accumulate overlapping ingredients+handlers -> Multiple outputs
+                    # This assumes there are no duplicates of recipes that list outputs as otherStacks
+                    key = (tuple(recipe.generic.ingredients), handler.tab_name)
+                    generic_recipes[key] = generic_recipes.get(key, []) + outputs
+                elif recipe.greg_data:
+                    inputs = stackngroup(
+                        recipe.greg_data.mInputs + recipe.greg_data.mFluidInputs
+                    )
+                    outputs = stackngroup_chances(
+                        recipe.greg_data.mOutputs, recipe.greg_data.mChances
+                    ) + stackngroup(recipe.greg_data.mFluidOutputs)
+                    meta = GregMeta(
+                        EUt=recipe.greg_data.mEUt, ticks=recipe.greg_data.mDuration
+                    )
+                    # Greg recipes can be added directly as each copy of a recipe will be the same
+                    final_recipes_set.add(
+                        Recipe(
+                            inputs=inputs,
+                            outputs=outputs,
+                            machine=handler.tab_name,
+                            meta=meta,
                         )
+                    )
+        normalizer_stats.items += 1
+        normalizer_stats.busy += time.perf_counter() - start
+    version = header["version"]
 
     print()
+    if pipeline:
+        print("Pipeline throughput:")
+        for stats in [s.stats for s in stages] + [normalizer_stats]:
+            print(f"  {stats}")
     print("Dumping generic recipes...")
     # Add generic recipes to final_recipes_set
     final_recipes_set.update(
@@ -148,7 +248,9 @@ def preprocess_recipes(data_dir: Path, output_dir: Path) -> bool:
             RecipeFile(
                 dump_version=version,
                 dump_sha=sha,
-                recipes=list(final_recipes_set),
+                cache_sha=cache_sha,
+                # Sets iterate in hash order, which changes between runs; sort so reruns are byte-identical
+                recipes=sorted(final_recipes_set, key=recipe_sort_key),
             ).model_dump_json()
         )
     return True
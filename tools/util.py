@@ -1,10 +1,13 @@
 import hashlib
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
 import json_stream
 import json_stream.base
 import json
 
-from tools.config_format import Config
+# Imported lazily in load_config so that cache checks don't pull in pydantic
+if TYPE_CHECKING:
+    from tools.config_format import Config
 
 
 # Relative to the data directory
@@ -19,24 +22,91 @@ RECIPES_FILTERED_FILENAME = "recipes_filtered.json"
 # Relative to the local directory
 CONFIG_PATH = "config.json"
 
+T = TypeVar("T")
+
+# Results of load_by_hash, keyed by loader and input file hashes
+_loaded_by_hash: dict[tuple, Any] = {}
+# How many load_by_hash calls reused a result vs. had to load it
+_load_counts = {"reused": 0, "loaded": 0}
+
 
 def get_hash(file: Path) -> str:
     with open(file, "rb") as f:
         return hashlib.file_digest(f, "sha256").hexdigest()
 
 
+def load_by_hash(load: Callable[..., T], *files: Path) -> T:
+    """
+    Calls load(*files), reusing the previous result if it was already called on files with identical contents.
+    Lets batch runs share parsed indices between dumps with the same oredict/handlers/config.
+    Results are shared, so callers must not modify them.
+    """
+    key = (load.__module__, load.__qualname__, *(get_hash(f) for f in files))
+    if key in _loaded_by_hash:
+        _load_counts["reused"] += 1
+    else:
+        _load_counts["loaded"] += 1
+        _loaded_by_hash[key] = load(*files)
+    return _loaded_by_hash[key]
+
+
+def get_loaded_by_hash() -> dict[tuple, Any]:
+    return dict(_loaded_by_hash)
+
+
+def seed_loaded_by_hash(loaded: dict[tuple, Any]):
+    """
+    Adds results from another process's load_by_hash cache, e.g. as a worker pool initializer.
+    """
+    _loaded_by_hash.update(loaded)
+
+
+def get_load_counts() -> dict[str, int]:
+    return dict(_load_counts)
+
+
+def combine_hashes(*hashes: str) -> str:
+    return hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()
+
+
+def get_pushdown_hash(sha: str, allowed_machines: set[str]) -> str:
+    """
+    Combines an input hash with a pushed-down machine predicate, so cached outputs
+    built with a different (or no) predicate are not mistaken for up to date.
+    """
+    predicate = "\n".join(sorted(allowed_machines))
+    return hashlib.sha256(f"{sha}\n{predicate}".encode("utf-8")).hexdigest()
+
+
+def read_recipe_file_header(recipe_file: Path, key: str) -> Optional[str]:
+    """
+    Reads one of the fields written before "recipes" in a recipe file, without loading the recipes.
+    Returns None if the file doesn't exist or doesn't have the field.
+    """
+    if not recipe_file.exists():
+        return None
+    with open(recipe_file, "r") as f:
+        file = json_stream.load(f)
+        if isinstance(file, json_stream.base.TransientStreamingJSONObject):
+            for k, v in file.items():
+                if k == key:
+                    return v
+                if k == "recipes":
+                    break
+    return None
+
+
+def read_cached_sha(output_file: Path) -> Optional[str]:
+    return read_recipe_file_header(output_file, "cache_sha")
+
+
 def check_cache_up_to_date(output_file: Path, sha: str) -> bool:
     if output_file.exists():
         print(f"Cached recipe file found at {output_file}, checking if it's up to date")
         # Check if the file is up to date
-        with open(output_file, "r") as f:
-            file = json_stream.load(f)
-            if (
-                isinstance(file, json_stream.base.TransientStreamingJSONObject)
-                and file["dump_sha"] == sha
-            ):
-                print("Cached recipe file is up to date!")
-                return True
+        if read_cached_sha(output_file) == sha:
+            print("Cached recipe file is up to date!")
+            return True
         print("Cached recipe file is not up to date!")
     return False
 
@@ -46,6 +116,8 @@ def parse_json(filename, class_type, encoding="utf-8"):
         return class_type(**json.load(f))
 
 
-def load_config() -> Config:
-    with open(CONFIG_PATH, "r") as f:
+def load_config(path: Path | str = CONFIG_PATH) -> "Config":
+    from tools.config_format import Config
+
+    with open(path, "r") as f:
         return Config(**json.load(f))